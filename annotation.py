@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import functools
+import math
+
+from enum import Enum, auto
+from typing import NamedTuple, List, Sequence, TypeVar, Optional, Iterable
+
+from fretboard import Position
+
+State = TypeVar('State')
+
+# Finger index used for open strings
+OPEN_STRING = 0
+
+
+class PickDirection(Enum):
+    """
+    Represents the direction of a pick stroke.
+
+    A down stroke moves towards the higher strings (lower string index).
+    """
+
+    DOWN = auto(),
+    UP = auto(),
+
+    def __str__(self):
+        lookup_table = {
+            PickDirection.DOWN: 'D',
+            PickDirection.UP: 'U',
+        }
+
+        return lookup_table[self]
+
+
+class PickingStyle(Enum):
+    """
+    Represents the picking technique used to play an exercise.
+
+    - ALTERNATE: Strictly alternating down and up strokes.
+    - ECONOMY: Alternating, but continuing the stroke direction when crossing to an adjacent string.
+    - SWEEP: Alternating on a string, continuing the stroke direction when crossing to any other string.
+    """
+
+    ALTERNATE = auto(),
+    ECONOMY = auto(),
+    SWEEP = auto(),
+
+    def __str__(self):
+        lookup_table = {
+            PickingStyle.ALTERNATE: 'alternate',
+            PickingStyle.ECONOMY: 'economy',
+            PickingStyle.SWEEP: 'sweep',
+        }
+
+        return lookup_table[self]
+
+
+class Annotation(NamedTuple):
+    """
+    Represents how a position is played, defined by a fretting hand finger and a pick direction.
+
+    Finger 0 is used for open strings, 1 to 4 are index to little finger.
+    """
+
+    finger: int
+    pick: PickDirection
+
+
+def annotate_exercise(positions: List[Position], picking=PickingStyle.ALTERNATE,
+                      fingers: Optional[List[int]] = None) -> List[Annotation]:
+    """
+    Determines fingers and pick directions to play the given positions.
+
+    :param positions: The positions to annotate.
+    :param picking: The picking technique to use.
+    :param fingers: Fingers determined by find_fingers, to reuse them for several picking techniques.
+    :return: One annotation per position.
+    """
+
+    if fingers is None:
+        fingers = find_fingers(positions)
+
+    picks = find_pick_directions(positions, picking)
+
+    return [Annotation(finger, pick) for finger, pick in zip(fingers, picks)]
+
+
+def find_fingers(positions: List[Position]) -> List[int]:
+    """
+    Determines the fretting hand fingers which minimize hand shifts (Viterbi algorithm).
+
+    Takes O(n * s^2) time for n positions and s possible fingers per position (one for open strings, four otherwise).
+
+    :param positions: The positions to play.
+    :return: One finger per position.
+    """
+
+    states = [_open_string_fingers if position.fret == 0 else _fretted_fingers for position in positions]
+    transitions = (_get_finger_transition_costs(previous, current, previous_fingers, fingers)
+                   for previous, current, previous_fingers, fingers
+                   in zip(positions, positions[1:], states, states[1:]))
+
+    return _find_cheapest_states(states, transitions)
+
+
+def find_pick_directions(positions: List[Position], picking=PickingStyle.ALTERNATE) -> List[PickDirection]:
+    """
+    Determines the pick directions for a given picking technique (Viterbi algorithm).
+
+    Takes O(n) time for n positions, since there are only two directions per position.
+
+    :param positions: The positions to play.
+    :param picking: The picking technique to use.
+    :return: One pick direction per position.
+    """
+
+    costs = _pick_transition_costs[picking]
+    states = [_pick_directions] * len(positions)
+    transitions = (costs[_get_string_change(previous, current)] for previous, current in zip(positions, positions[1:]))
+
+    return _find_cheapest_states(states, transitions, start_costs=[0, 1])
+
+
+def _find_cheapest_states(states: List[Sequence[State]], transitions: Iterable[List[List[float]]],
+                          start_costs: Optional[List[float]] = None) -> List[State]:
+    # states[i] are the possible states at position i, each transition matrix holds the costs from the states at
+    # position i (rows) to the states at position i + 1 (columns)
+    if not states:
+        return []
+
+    costs = start_costs or [0] * len(states[0])
+    back_pointers: List[List[int]] = []
+
+    for matrix in transitions:
+        next_costs = []
+        pointers = []
+
+        for column in range(len(matrix[0])):
+            best_index = 0
+            best_cost = costs[0] + matrix[0][column]
+
+            for index in range(1, len(costs)):
+                cost = costs[index] + matrix[index][column]
+                if cost < best_cost:
+                    best_index = index
+                    best_cost = cost
+
+            next_costs.append(best_cost)
+            pointers.append(best_index)
+
+        costs = next_costs
+        back_pointers.append(pointers)
+
+    index = min(range(len(costs)), key=costs.__getitem__)
+    result = [states[-1][index]]
+
+    for position_states, pointers in zip(reversed(states[:-1]), reversed(back_pointers)):
+        index = pointers[index]
+        result.append(position_states[index])
+
+    result.reverse()
+    return result
+
+
+_open_string_fingers = [OPEN_STRING]
+_fretted_fingers = [1, 2, 3, 4]
+
+
+def _get_finger_transition_costs(previous: Position, current: Position,
+                                 previous_fingers: List[int], fingers: List[int]) -> List[List[float]]:
+    if previous.fret == 0 or current.fret == 0:
+        return [[0] * len(fingers) for _ in previous_fingers]
+
+    hand_shift = current.fret - previous.fret
+    roll = current.string != previous.string and current.fret == previous.fret
+
+    return _get_fretted_finger_transition_costs(hand_shift, roll)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_fretted_finger_transition_costs(fret_distance: int, roll: bool) -> List[List[float]]:
+    # the matrices only depend on the fret distance and whether the finger has to roll, so there are only a few of them
+    matrix = []
+
+    for previous_finger in _fretted_fingers:
+        row = []
+
+        for finger in _fretted_fingers:
+            # the hand position is the fret of the index finger, every fret the hand has to move costs one
+            cost = abs(fret_distance - finger + previous_finger)
+
+            # using the same finger on another string at the same fret requires rolling the finger over
+            if roll and finger == previous_finger:
+                cost += 1
+
+            row.append(cost)
+
+        matrix.append(row)
+
+    return matrix
+
+
+_pick_directions = [PickDirection.DOWN, PickDirection.UP]
+
+
+class _StringChange(Enum):
+    SAME_STRING = auto(),
+    ADJACENT_DOWN = auto(),
+    ADJACENT_UP = auto(),
+    SKIP_DOWN = auto(),
+    SKIP_UP = auto(),
+
+
+def _get_string_change(previous: Position, current: Position) -> _StringChange:
+    # moving down means moving to a higher string (lower string index), like a down stroke
+    distance = previous.string - current.string
+
+    if distance == 0:
+        return _StringChange.SAME_STRING
+    if distance == 1:
+        return _StringChange.ADJACENT_DOWN
+    if distance == -1:
+        return _StringChange.ADJACENT_UP
+    if distance > 0:
+        return _StringChange.SKIP_DOWN
+
+    return _StringChange.SKIP_UP
+
+
+# transition matrices of the pick directions (rows: previous down, up; columns: current down, up)
+_alternate = [[math.inf, 0], [0, math.inf]]
+_continue_down = [[0, math.inf], [0, math.inf]]
+_continue_up = [[math.inf, 0], [math.inf, 0]]
+
+_pick_transition_costs = {
+    PickingStyle.ALTERNATE: {change: _alternate for change in _StringChange},
+    PickingStyle.ECONOMY: {
+        _StringChange.SAME_STRING: _alternate,
+        _StringChange.ADJACENT_DOWN: _continue_down,
+        _StringChange.ADJACENT_UP: _continue_up,
+        _StringChange.SKIP_DOWN: _alternate,
+        _StringChange.SKIP_UP: _alternate,
+    },
+    PickingStyle.SWEEP: {
+        _StringChange.SAME_STRING: _alternate,
+        _StringChange.ADJACENT_DOWN: _continue_down,
+        _StringChange.ADJACENT_UP: _continue_up,
+        _StringChange.SKIP_DOWN: _continue_down,
+        _StringChange.SKIP_UP: _continue_up,
+    },
+}
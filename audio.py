@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import wave
+
+from typing import List, NamedTuple, Iterator
+
+import numpy as np
+
+from exercises import Feel
+from fretboard import Position, Tuning
+
+SAMPLE_RATE = 44100
+
+# Number of samples rendered at once, only the sounds ringing in the current block are kept in memory
+BLOCK_SIZE = 8192
+
+# Maximum time a note rings if it is not stopped by the next note on the same string
+MAX_RING_TIME = 2.0
+
+# Fade out at the end of a note to avoid cracks
+RELEASE_TIME = 0.01
+
+# Relative position on the string where it is plucked, determines the amplitudes of the harmonics
+PLUCK_POSITION = 0.2
+HARMONIC_COUNT = 12
+
+CLICK_LENGTH = 0.03
+MASTER_GAIN = 0.3
+
+
+class _Sound(NamedTuple):
+    """
+    A sound made of decaying partials, starting and ending at the given sample index.
+    """
+
+    start: int
+    end: int
+    frequencies: np.ndarray
+    amplitudes: np.ndarray
+    decays: np.ndarray
+
+
+class _ExerciseAudio(NamedTuple):
+    """
+    An exercise added to a WAV file, its sounds are only created while writing the file.
+    """
+
+    start: int
+    positions: List[Position]
+    note_length: float
+    beat_length: float
+    beat_count: int
+
+
+class WavFile:
+    """
+    Renders exercises to a WAV file using a simple plucked string model.
+    """
+
+    def __init__(self, tuning: Tuning, tempo: int, click=False):
+        self.tuning = tuning
+        self.tempo = tempo
+        self.click = click
+        self.exercises: List[_ExerciseAudio] = []
+        self.length = 0
+        self.end = 0
+
+    def add_exercise(self, positions: List[Position], rhythm: Feel):
+        notes_per_beat = {
+            Feel.STRAIGHT: 4,
+            Feel.TRIPLET: 3,
+        }
+
+        beat_length = SAMPLE_RATE * 60 / self.tempo
+        note_length = beat_length / notes_per_beat[rhythm]
+
+        # like in the GuitarPro file, every exercise uses whole measures of four beats
+        measure_count = max(1, -(-len(positions) // (4 * notes_per_beat[rhythm])))
+        beat_count = 4 * measure_count
+
+        exercise = _ExerciseAudio(self.length, positions, note_length, beat_length, beat_count)
+        self.exercises.append(exercise)
+        self.length = exercise.start + round(beat_count * beat_length)
+
+        # the last note is never stopped by a following note, it rings the longest
+        if positions:
+            self.end = max(self.end, _get_note_start(exercise, len(positions) - 1) + round(MAX_RING_TIME * SAMPLE_RATE))
+
+    def write(self, path: str):
+        length = max(self.length, self.end)
+        sounds = itertools.chain.from_iterable(self._generate_sounds(exercise) for exercise in self.exercises)
+        next_sound = next(sounds, None)
+        active: List[_Sound] = []
+
+        with wave.open(path, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(SAMPLE_RATE)
+
+            for block_start in range(0, length, BLOCK_SIZE):
+                block_end = min(block_start + BLOCK_SIZE, length)
+
+                while next_sound and next_sound.start < block_end:
+                    active.append(next_sound)
+                    next_sound = next(sounds, None)
+
+                active = [sound for sound in active if sound.end > block_start]
+                block = np.zeros(block_end - block_start)
+
+                for sound in active:
+                    _render_sound(sound, block, block_start)
+
+                samples = np.clip(block * MASTER_GAIN, -1.0, 1.0)
+                f.writeframes((samples * 32767).astype('<i2').tobytes())
+
+    def _generate_sounds(self, exercise: _ExerciseAudio) -> Iterator[_Sound]:
+        # exercises do not overlap, so merging the notes and clicks of each exercise yields all sounds in start order
+        notes = (self._create_pluck(exercise, i) for i in range(len(exercise.positions)))
+
+        if not self.click:
+            return notes
+
+        clicks = (_create_click(exercise.start + round(beat * exercise.beat_length), accent=beat % 4 == 0)
+                  for beat in range(exercise.beat_count))
+
+        return heapq.merge(notes, clicks, key=lambda sound: sound.start)
+
+    def _create_pluck(self, exercise: _ExerciseAudio, index: int) -> _Sound:
+        position = exercise.positions[index]
+        start = _get_note_start(exercise, index)
+        end = start + round(MAX_RING_TIME * SAMPLE_RATE)
+
+        # a note rings until the next note on the same string is played, only notes within the ring time can stop it
+        for next_index in range(index + 1, len(exercise.positions)):
+            next_start = _get_note_start(exercise, next_index)
+
+            if next_start >= end:
+                break
+
+            if exercise.positions[next_index].string == position.string:
+                end = next_start
+                break
+
+        note = self.tuning.get_note(position)
+        frequency = 440.0 * 2 ** ((note.value - 69) / 12)
+
+        harmonics = np.arange(1, HARMONIC_COUNT + 1)
+        harmonics = harmonics[harmonics * frequency < SAMPLE_RATE / 2]
+
+        # higher harmonics decay faster, giving the characteristic dull tail of a plucked string
+        amplitudes = np.abs(np.sin(np.pi * harmonics * PLUCK_POSITION)) / harmonics ** 2
+        decays = 1.5 + 0.8 * harmonics * frequency / 440.0
+
+        return _Sound(start, end, harmonics * frequency, amplitudes, decays)
+
+
+def _get_note_start(exercise: _ExerciseAudio, index: int) -> int:
+    return exercise.start + round(index * exercise.note_length)
+
+
+def _create_click(start: int, accent: bool) -> _Sound:
+    frequency = 1500.0 if accent else 1000.0
+    end = start + round(CLICK_LENGTH * SAMPLE_RATE)
+
+    return _Sound(start, end, np.array([frequency]), np.array([0.5]), np.array([150.0]))
+
+
+def _render_sound(sound: _Sound, block: np.ndarray, block_start: int):
+    first = max(sound.start, block_start)
+    last = min(sound.end, block_start + len(block))
+
+    if first >= last:
+        return
+
+    t = np.arange(first - sound.start, last - sound.start) / SAMPLE_RATE
+    partials = np.exp(-sound.decays[:, None] * t) * np.sin(2 * np.pi * sound.frequencies[:, None] * t)
+    samples = sound.amplitudes @ partials
+
+    # fade out at the end of the sound
+    release = (sound.end - sound.start) / SAMPLE_RATE - t
+    samples *= np.clip(release / RELEASE_TIME, 0.0, 1.0)
+
+    block[first - block_start:last - block_start] += samples
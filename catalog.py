@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import ast
+import hashlib
+import json
+import os
+import tomllib
+
+from typing import List, NamedTuple, Dict, Union, Any, Callable
+from exercises import Feel, ExerciseDescriptor
+from fretboard import Tuning
+from music_theory import Scale
+
+# Exercise catalog used if none is given on the command line
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalog.toml')
+
+# Increase whenever the structure of the compiled catalog changes
+CATALOG_CACHE_VERSION = 3
+
+
+class Catalog(NamedTuple):
+    """
+    Represents an exercise catalog defined by a tuning, a set of scales and a set of exercises.
+    """
+
+    tuning_text: str
+    scale_texts: List[str]
+    exercises: List[ExerciseDescriptor]
+
+
+def load_catalog(path: str) -> Catalog:
+    """
+    Loads an exercise catalog from a TOML file (see catalog.toml).
+
+    The validated catalog is cached as JSON next to the catalog file, keyed by the hash of its content. As long as the
+    file is not modified, subsequent calls only load the cache.
+
+    :param path: Path to the catalog file.
+    :return: The loaded catalog.
+    """
+
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    digest = hashlib.sha256(content).hexdigest()
+    cache_path = path + '.cache'
+
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+
+        if cache['version'] == CATALOG_CACHE_VERSION and cache['digest'] == digest:
+            return _catalog_from_json(cache['catalog'])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+
+    catalog = parse_catalog(content.decode('utf-8'))
+    cache = {'version': CATALOG_CACHE_VERSION, 'digest': digest, 'catalog': _catalog_to_json(catalog)}
+
+    try:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+    except OSError:
+        pass
+
+    return catalog
+
+
+def _catalog_to_json(catalog: Catalog) -> Dict[str, Any]:
+    exercises = [{'name': e.name, 'pattern': e.pattern, 'feel': str(e.feel)} for e in catalog.exercises]
+    return {'tuning': catalog.tuning_text, 'scales': catalog.scale_texts, 'exercises': exercises}
+
+
+def _catalog_from_json(data: Dict[str, Any]) -> Catalog:
+    feels = {str(feel): feel for feel in Feel}
+    exercises = [ExerciseDescriptor(e['name'], [int(offset) for offset in e['pattern']], feels[e['feel']])
+                 for e in data['exercises']]
+
+    return Catalog(str(data['tuning']), [str(scale_text) for scale_text in data['scales']], exercises)
+
+
+def parse_catalog(text: str) -> Catalog:
+    """
+    Parses and validates an exercise catalog from its TOML representation.
+
+    :param text: Text to parse.
+    :return: The parsed catalog.
+    """
+
+    data = tomllib.loads(text)
+
+    if not isinstance(data.get('tuning'), str):
+        raise ValueError('tuning must be a string, for example \'E2-A2-D3-G3-B3-E4\'')
+
+    scale_texts = data.get('scales')
+
+    if not isinstance(scale_texts, list) or not all(isinstance(scale_text, str) for scale_text in scale_texts):
+        raise ValueError('scales must be a list of strings, for example [\'E Aeolian\']')
+
+    _check_parsable(data['tuning'], 'tuning', Tuning.from_text)
+
+    for scale_text in scale_texts:
+        _check_parsable(scale_text, 'scale', Scale.from_text)
+
+    intervals: Dict[str, int] = data.get('intervals', {})
+    groups: Dict[str, List[Dict[str, Any]]] = data.get('exercises', {})
+    exercises = []
+
+    if not isinstance(intervals, dict):
+        raise ValueError('intervals must be a table of interval names and scale steps')
+
+    if not isinstance(groups, dict):
+        raise ValueError('exercises must be a table of exercise groups')
+
+    for interval_name, steps in intervals.items():
+        if not _is_integer(steps):
+            raise ValueError(f'intervals: steps of "{interval_name}" must be an integer')
+
+    for group, entries in groups.items():
+        if not isinstance(entries, list):
+            raise ValueError(f'{group}: expected an array of exercises')
+
+        for index, entry in enumerate(entries):
+            exercises.extend(_parse_entry(entry, f'{group}: entry {index + 1}', intervals))
+
+    return Catalog(data['tuning'], scale_texts, exercises)
+
+
+def _check_parsable(text: str, kind: str, parse: Callable[[str], Any]):
+    # the text parsers report invalid input with assertions and lookup errors
+    try:
+        parse(text)
+    except (AssertionError, IndexError, KeyError, TypeError, ValueError):
+        raise ValueError(f'invalid {kind} "{text}"') from None
+
+
+def _parse_entry(entry: Dict[str, Any], location: str, intervals: Dict[str, int]) -> List[ExerciseDescriptor]:
+    if not isinstance(entry, dict):
+        raise ValueError(f'{location}: expected a table with name, pattern and feel')
+
+    for key in ('name', 'pattern', 'feel'):
+        if key not in entry:
+            raise ValueError(f'{location}: missing "{key}"')
+
+    if not isinstance(entry['name'], str):
+        raise ValueError(f'{location}: name must be a string')
+
+    location = f'{location} ("{entry["name"]}")'
+    feels = {str(feel): feel for feel in Feel}
+
+    if not isinstance(entry['feel'], str) or entry['feel'] not in feels:
+        raise ValueError(f'{location}: unknown feel {entry["feel"]!r}')
+
+    if not isinstance(entry['pattern'], list):
+        raise ValueError(f'{location}: pattern must be a list of offsets')
+
+    offsets = [_parse_offset(offset, location) for offset in entry['pattern']]
+
+    if all(isinstance(offset, int) for offset in offsets):
+        return [_create_exercise(entry['name'], location, offsets, feels[entry['feel']])]
+
+    # templates are validated once with arbitrary steps, even if no intervals are defined
+    _format_name(entry['name'], location, '')
+    _create_exercise(entry['name'], location, offsets, feels[entry['feel']], validate_only=True)
+
+    return [_create_exercise(_format_name(entry['name'], location, interval_name), location, offsets,
+                             feels[entry['feel']], steps)
+            for interval_name, steps in intervals.items()]
+
+
+def _format_name(name: str, location: str, interval_name: str) -> str:
+    try:
+        return name.format(interval=interval_name)
+    except (KeyError, IndexError, ValueError) as e:
+        raise ValueError(f'{location}: invalid name ({e})') from None
+
+
+def _create_exercise(name: str, location: str, offsets: List[Union[int, ast.AST]], feel: Feel, steps=1,
+                     validate_only=False) -> ExerciseDescriptor:
+    pattern = [_evaluate_offset(offset, steps, location) for offset in offsets]
+
+    if not validate_only and (not pattern or sum(pattern) <= 0):
+        raise ValueError(f'{location}: pattern of "{name}" must have a positive sum')
+
+    return ExerciseDescriptor(name, pattern, feel)
+
+
+def _is_integer(value: Any) -> bool:
+    # TOML booleans are parsed to bool, which is a subclass of int
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _parse_offset(offset: Any, location: str) -> Union[int, ast.AST]:
+    """
+    Parses an offset of a pattern, which is either an integer or an expression in 's' (the interval steps).
+
+    Examples: 2, 's', '-(s - 1)'
+    """
+
+    if _is_integer(offset):
+        return offset
+
+    if not isinstance(offset, str):
+        raise ValueError(f'{location}: invalid pattern offset {offset!r}, expected an integer or an expression in s')
+
+    try:
+        return ast.parse(offset, mode='eval').body
+    except SyntaxError:
+        raise ValueError(f'{location}: invalid pattern offset "{offset}"') from None
+
+
+def _evaluate_offset(offset: Union[int, ast.AST], steps: int, location: str) -> int:
+    if isinstance(offset, int):
+        return offset
+
+    def evaluate(node: ast.AST) -> int:
+        if isinstance(node, ast.Constant) and _is_integer(node.value):
+            return node.value
+        if isinstance(node, ast.Name) and node.id == 's':
+            return steps
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return -evaluate(node.operand)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+            return evaluate(node.left) + evaluate(node.right)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Sub):
+            return evaluate(node.left) - evaluate(node.right)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+            return evaluate(node.left) * evaluate(node.right)
+
+        raise ValueError(f'{location}: invalid pattern offset "{ast.unparse(offset)}"')
+
+    return evaluate(offset)
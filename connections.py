@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import functools
+import heapq
+
+from typing import List, Dict, Tuple, Set
+
+from fretboard import HIGHEST_FRET, Context, Position, Shape, get_all_caged_shapes
+from music_theory import AbsNote, ScaleDegree
+
+# Number of frets covered by the fretting hand without stretching (one finger per fret)
+HAND_SPAN = 4
+
+# Cost to reach one fret beyond the hand span in either direction
+STRETCH_COST = 2
+
+# Cost of a hand shift in addition to the number of frets the hand moves
+SHIFT_COST = 3
+
+HandPosition = Tuple[Position, int]
+FretboardGraph = Dict[HandPosition, List[Tuple[HandPosition, int]]]
+
+
+def get_connected_shape(ctx: Context) -> Shape:
+    """
+    Returns a shape which travels up the neck through all CAGED shapes of a given fretboard context.
+
+    :param ctx: The fretboard context.
+    :return: The connected shape.
+    """
+
+    shapes = sorted(get_all_caged_shapes(ctx).values(), key=lambda shape: min(p.fret for p in shape))
+    return connect_shapes(ctx, shapes)
+
+
+def connect_shapes(ctx: Context, shapes: List[Shape]) -> Shape:
+    """
+    Connects the given shapes to a single shape.
+
+    The result starts with the first note of the first shape and ends with the last note of the last shape. It plays
+    each scale note once and passes through the shapes in the given order, changing from one shape to the next on one of
+    the middle strings. The transition points are chosen to minimize hand shifts and stretches (Dijkstra's algorithm on
+    the fretboard graph, whose nodes are a position together with the fret of the index finger).
+
+    :param ctx: The fretboard context.
+    :param shapes: The shapes to connect, each one ascending.
+    :return: The connected shape.
+    """
+
+    graph = get_fretboard_graph(ctx)
+    shape_positions: List[Set[Position]] = [set(shape) for shape in shapes]
+    middle_strings = range(1, ctx.tuning.string_count() - 1)
+
+    start_position = shapes[0][0]
+    goal_position = shapes[-1][-1]
+    goal_shape_index = len(shapes) - 1
+
+    costs: Dict[Tuple[int, HandPosition], int] = {}
+    predecessors: Dict[Tuple[int, HandPosition], Tuple[int, HandPosition]] = {}
+    queue = []
+
+    for hand in _get_hands(start_position):
+        node = (0, (start_position, hand))
+        costs[node] = _get_stretch_cost(start_position, hand)
+        heapq.heappush(queue, (costs[node], node))
+
+    goal = None
+
+    while queue:
+        cost, node = heapq.heappop(queue)
+        shape_index, (position, hand) = node
+
+        if shape_index == goal_shape_index and position == goal_position:
+            goal = node
+            break
+
+        if cost > costs[node]:
+            continue
+
+        for next_hand_position, edge_cost in graph[(position, hand)]:
+            next_position = next_hand_position[0]
+
+            for next_shape_index in (shape_index, shape_index + 1):
+                if next_shape_index >= len(shapes) or next_position not in shape_positions[next_shape_index]:
+                    continue
+
+                if next_shape_index != shape_index and not (position.string in middle_strings and
+                                                            next_position.string in middle_strings):
+                    continue
+
+                next_node = (next_shape_index, next_hand_position)
+                next_cost = cost + edge_cost
+
+                if next_cost < costs.get(next_node, next_cost + 1):
+                    costs[next_node] = next_cost
+                    predecessors[next_node] = node
+                    heapq.heappush(queue, (next_cost, next_node))
+
+    if goal is None:
+        raise ValueError('shapes cannot be connected')
+
+    result = [goal[1][0]]
+    node = goal
+
+    while node in predecessors:
+        node = predecessors[node]
+        result.append(node[1][0])
+
+    result.reverse()
+    return result
+
+
+@functools.lru_cache(maxsize=16)
+def get_fretboard_graph(ctx: Context) -> FretboardGraph:
+    """
+    Returns the graph of all scale positions of a given fretboard context (cached per tuning and scale).
+
+    The nodes are positions together with the fret of the index finger used to play them. Every node is connected to
+    the nodes of the next higher scale note, weighted by the cost of the hand shift and stretch needed to play it.
+
+    :param ctx: The fretboard context.
+    :return: Adjacency list per node.
+    """
+
+    string_count = ctx.tuning.string_count()
+    positions_by_note: Dict[int, List[Position]] = {}
+
+    for string in range(string_count):
+        for fret in range(HIGHEST_FRET + 1):
+            position = Position(string, fret)
+            note = ctx.tuning.get_note(position)
+
+            if _is_in_scale(ctx, note):
+                positions_by_note.setdefault(note.value, []).append(position)
+
+    graph: FretboardGraph = {}
+
+    for note_value, positions in positions_by_note.items():
+        next_positions = positions_by_note.get(_get_next_scale_note_value(ctx, note_value), [])
+
+        for position in positions:
+            for hand in _get_hands(position):
+                graph[(position, hand)] = [
+                    ((next_position, next_hand), _get_move_cost(hand, next_position, next_hand))
+                    for next_position in next_positions
+                    for next_hand in (_get_hands(next_position) if next_position.fret > 0 else [hand])
+                ]
+
+    return graph
+
+
+def _get_hands(position: Position) -> List[int]:
+    # index finger frets from which a position can be played, open strings can be played from anywhere
+    if position.fret == 0:
+        return list(range(1, HIGHEST_FRET - HAND_SPAN + 2))
+
+    return [hand for hand in range(position.fret - HAND_SPAN, position.fret + 2)
+            if 1 <= hand <= HIGHEST_FRET - HAND_SPAN + 1]
+
+
+def _get_stretch_cost(position: Position, hand: int) -> int:
+    if position.fret == 0 or hand <= position.fret < hand + HAND_SPAN:
+        return 0
+
+    return STRETCH_COST
+
+
+def _get_move_cost(hand: int, next_position: Position, next_hand: int) -> int:
+    cost = _get_stretch_cost(next_position, next_hand)
+
+    if next_hand != hand:
+        cost += SHIFT_COST + abs(next_hand - hand)
+
+    return cost
+
+
+def _is_in_scale(ctx: Context, note: AbsNote) -> bool:
+    return ScaleDegree((note.value - ctx.scale.root.value) % 12) in ctx.scale.degrees
+
+
+def _get_next_scale_note_value(ctx: Context, note_value: int) -> int:
+    next_note_value = note_value + 1
+
+    while not _is_in_scale(ctx, AbsNote(next_note_value)):
+        next_note_value += 1
+
+    return next_note_value
+
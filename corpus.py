@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import argparse
+import mmap
+import os
+import struct
+
+from typing import List, Dict, Tuple, BinaryIO
+from catalog import DEFAULT_CATALOG_PATH, load_catalog
+from exercises import ExerciseDescriptor, generate_exercise
+from fretboard import Tuning, Context, Position, CagedPosition, get_all_caged_shapes
+from music_theory import Scale
+
+# Corpus file layout (all integers little endian):
+# - header: magic, format version, number of index entries, length of the tuning text
+# - tuning text (utf-8)
+# - index: per entry the key length, the key (utf-8), the data offset and the number of positions
+# - data: two unsigned bytes (string, fret) per position
+CORPUS_MAGIC = b'GEXC'
+CORPUS_VERSION = 2
+
+_header_struct = struct.Struct('<4sHIH')
+_key_length_struct = struct.Struct('<H')
+_index_entry_struct = struct.Struct('<II')
+
+_key_separator = '\x1f'
+
+
+def build_corpus(path: str, tuning_text: str, scale_texts: List[str], exercises: List[ExerciseDescriptor]):
+    """
+    Precomputes all exercises for the given scales and writes them to a corpus file.
+
+    For every scale and CAGED position, the shape itself as well as every exercise pattern in both directions is stored.
+
+    :param path: Path to the corpus file to write.
+    :param tuning_text: Text representation of the tuning.
+    :param scale_texts: Text representations of the scales.
+    :param exercises: The exercises to precompute.
+    """
+
+    entries: Dict[str, List[Position]] = {}
+
+    for scale_text in scale_texts:
+        ctx = Context(Tuning.from_text(tuning_text), Scale.from_text(scale_text))
+
+        for caged_position, shape in get_all_caged_shapes(ctx).items():
+            entries[_shape_key(scale_text, caged_position)] = shape
+
+            for exercise in exercises:
+                for reverse in (False, True):
+                    key = _exercise_key(scale_text, caged_position, exercise.pattern, reverse)
+                    entries[key] = generate_exercise(shape, exercise.pattern, reverse=reverse)
+
+    with open(path, 'wb') as f:
+        _write_corpus(f, tuning_text, entries)
+
+
+def _write_corpus(f: BinaryIO, tuning_text: str, entries: Dict[str, List[Position]]):
+    tuning_bytes = tuning_text.encode('utf-8')
+    f.write(_header_struct.pack(CORPUS_MAGIC, CORPUS_VERSION, len(entries), len(tuning_bytes)))
+    f.write(tuning_bytes)
+
+    offset = 0
+
+    for key, positions in entries.items():
+        key_bytes = key.encode('utf-8')
+        f.write(_key_length_struct.pack(len(key_bytes)))
+        f.write(key_bytes)
+        f.write(_index_entry_struct.pack(offset, len(positions)))
+        offset += 2 * len(positions)
+
+    for positions in entries.values():
+        f.write(bytes(value for position in positions for value in position))
+
+
+class Corpus:
+    """
+    Read access to a precomputed exercise corpus (see build_corpus).
+
+    The file is memory mapped, only the index is parsed when opening it.
+    """
+
+    def __init__(self, path: str, tuning_text: str):
+        """
+        Opens a corpus file.
+
+        :param path: Path to the corpus file.
+        :param tuning_text: Text representation of the expected tuning.
+        """
+
+        self.path = path
+
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f'{path} is not an exercise corpus')
+
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._view = memoryview(self._mmap)
+
+        try:
+            magic, version, entry_count, tuning_length = _header_struct.unpack_from(self._view, 0)
+
+            if magic != CORPUS_MAGIC:
+                raise ValueError(f'{path} is not an exercise corpus')
+
+            if version != CORPUS_VERSION:
+                raise ValueError(f'{path} has unsupported corpus version {version} (expected {CORPUS_VERSION})')
+
+            cursor = _header_struct.size
+            corpus_tuning_text = bytes(self._view[cursor:cursor + tuning_length]).decode('utf-8')
+            cursor += tuning_length
+
+            if corpus_tuning_text != tuning_text:
+                raise ValueError(f'{path} was built for tuning {corpus_tuning_text}, not {tuning_text}')
+
+            self._index: Dict[str, Tuple[int, int]] = {}
+
+            for _ in range(entry_count):
+                key_length, = _key_length_struct.unpack_from(self._view, cursor)
+                cursor += _key_length_struct.size
+                key = bytes(self._view[cursor:cursor + key_length]).decode('utf-8')
+                cursor += key_length
+                self._index[key] = _index_entry_struct.unpack_from(self._view, cursor)
+                cursor += _index_entry_struct.size
+        except (struct.error, UnicodeDecodeError):
+            self.close()
+            raise ValueError(f'{path} is corrupt') from None
+        except ValueError:
+            self.close()
+            raise
+
+        self._data_start = cursor
+
+    def get_shape(self, scale_text: str, caged_position: CagedPosition) -> List[Position]:
+        """
+        Returns a precomputed CAGED shape.
+
+        :param scale_text: Text representation of the scale.
+        :param caged_position: The CAGED position of the shape.
+        :return: The positions of the shape.
+        """
+
+        key = _shape_key(scale_text, caged_position)
+
+        if key not in self._index:
+            raise ValueError(f'{self.path} contains no {caged_position.name} shape for {scale_text}, '
+                             f'rebuild it with corpus.py')
+
+        return self._read_positions(key)
+
+    def get_exercise(self, scale_text: str, caged_position: CagedPosition, pattern: List[int],
+                     reverse=False) -> List[Position]:
+        """
+        Returns a precomputed exercise.
+
+        :param scale_text: Text representation of the scale.
+        :param caged_position: The CAGED position of the shape.
+        :param pattern: The pattern used to traverse the shape.
+        :param reverse: True, for the reversed exercise. False, otherwise.
+        :return: The positions to play the exercise.
+        """
+
+        key = _exercise_key(scale_text, caged_position, pattern, reverse)
+
+        if key not in self._index:
+            raise ValueError(f'{self.path} contains no exercise with pattern {pattern} in the {caged_position.name} '
+                             f'shape for {scale_text}, rebuild it with corpus.py')
+
+        return self._read_positions(key)
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self) -> Corpus:
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _read_positions(self, key: str) -> List[Position]:
+        offset, count = self._index[key]
+        start = self._data_start + offset
+
+        if start + 2 * count > len(self._view):
+            raise ValueError(f'{self.path} is corrupt')
+
+        data = self._view[start:start + 2 * count]
+
+        return [Position(data[i], data[i + 1]) for i in range(0, len(data), 2)]
+
+
+def _shape_key(scale_text: str, caged_position: CagedPosition) -> str:
+    return _key_separator.join([scale_text, caged_position.name])
+
+
+def _exercise_key(scale_text: str, caged_position: CagedPosition, pattern: List[int], reverse: bool) -> str:
+    pattern_text = ','.join(str(offset) for offset in pattern)
+    return _key_separator.join([scale_text, caged_position.name, pattern_text, 'reverse' if reverse else 'forward'])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('output_file', help='Path to the generated corpus file.')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG_PATH, help='Path to the exercise catalog.')
+    args = parser.parse_args()
+
+    catalog = load_catalog(args.catalog)
+    build_corpus(args.output_file, catalog.tuning_text, catalog.scale_texts, catalog.exercises)
+
+
+if __name__ == '__main__':
+    main()
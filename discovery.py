@@ -0,0 +1,531 @@
+from __future__ import annotations
+
+import argparse
+import bisect
+import heapq
+import itertools
+import operator
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple, Iterator, Iterable, NamedTuple, Optional, Dict
+from catalog import DEFAULT_CATALOG_PATH, load_catalog
+from fretboard import Tuning, Context, Shape, get_all_caged_shapes
+from music_theory import Scale
+
+Pattern = Tuple[int, ...]
+
+
+class PatternRating(NamedTuple):
+    """
+    Represents the rating of a pattern across a set of shapes.
+
+    - stretch: Largest fret distance between two consecutive notes in any shape.
+    - string_skips: Total number of consecutive notes which skip at least one string.
+    - note_count: Number of notes of the shortest resulting exercise.
+    """
+
+    pattern: Pattern
+    stretch: int
+    string_skips: int
+    note_count: int
+
+    def ranking_key(self):
+        """
+        Returns the key used to rank patterns: less string skips, then less stretch, then more notes.
+        """
+
+        return self.string_skips, self.stretch, -self.note_count
+
+
+def canonicalize(pattern: List[int]) -> Pattern:
+    """
+    Returns the canonical form of a pattern.
+
+    All rotations of a pattern traverse a shape the same way and so does a pattern repeated multiple times.
+    The canonical form is the lexicographically smallest rotation of the shortest repeating unit.
+
+    Example: [1, 1, -1, 1, 1, -1] -> (-1, 1, 1)
+
+    :param pattern: The pattern to canonicalize.
+    :return: The canonical form.
+    """
+
+    length = len(pattern)
+
+    for period in range(1, length + 1):
+        if length % period == 0 and list(pattern[:period]) * (length // period) == list(pattern):
+            break
+
+    unit = tuple(pattern[:period])
+    return min(unit[i:] + unit[:i] for i in range(period))
+
+
+def enumerate_patterns(max_length: int, max_step: int, max_span: Optional[int] = None) -> Iterator[Pattern]:
+    """
+    Enumerates the canonical forms of all patterns which can be used to generate an exercise.
+
+    Candidates are generated as Lyndon words (Duval's algorithm), so every rotation class and every repeated pattern
+    is visited exactly once, without canonicalizing each candidate afterwards.
+
+    :param max_length: Maximum number of offsets in a pattern.
+    :param max_step: Maximum absolute value of a single offset.
+    :param max_span: Maximum number of notes between the lowest and the highest note of a cycle (defaults to any). All
+        patterns starting with a prefix which already spans more notes are skipped at once.
+    :return: Iterator over the canonical patterns with a positive sum.
+    """
+
+    search = _PatternSearch(max_length, max_step, max_span)
+
+    for unit in search.units():
+        for length, letters in search.walk(unit):
+            value_sum, low, high, _, _ = search.states[length - 1]
+
+            if high - low > search.max_span:
+                continue
+
+            prefix = tuple(search.values[x] for x in search.word[:length - 1])
+
+            for letter in letters:
+                if value_sum + search.values[letter] > 0:
+                    yield prefix + (search.values[letter],)
+
+
+class _PatternSearch:
+    """
+    Depth-first search over the Lyndon words of offsets (see enumerate_patterns).
+
+    The state of every prefix of the current word is kept on a stack, entry i belongs to the first i letters. A state is
+    a tuple of the sum of the offsets, the lowest and highest sum of their leading offsets (including none and all)
+    and the packed metrics of all transitions made by the offsets (see _TransitionTables, without tables they are 0).
+    Changing the last letter of the word only replaces the last entry, so each word costs a few integer operations,
+    independent of its length.
+
+    The search is split into units by the first two letters, which can be searched independently and in any order.
+    """
+
+    def __init__(self, max_length: int, max_step: int, max_span: Optional[int] = None,
+                 tables: Optional[_TransitionTables] = None):
+        self.max_length = max_length
+        self.values = [x for x in range(-max_step, max_step + 1) if x != 0]
+        self.max_span = max_span if max_span is not None else max_step * max_length
+        self.tables = tables
+
+        self.word: List[int] = []
+        self.states: List[Tuple[int, int, int, int, int]] = [(0, 0, 0, 0, 0)]
+
+    def units(self) -> List[Tuple[int, int]]:
+        """
+        Returns the units of the search in lexicographic order. A unit (a, b) covers all words starting with the
+        letters a and b, the unit (a, a) also covers the word consisting of a alone.
+        """
+
+        letters = range(len(self.values))
+        return [(a, b) for a in letters for b in letters if a == b or (a < b and self.max_length > 1)]
+
+    def walk(self, unit: Tuple[int, int]) -> Iterator[Tuple[int, range]]:
+        """
+        Visits all words of a unit in lexicographic order.
+
+        Words of the maximum length which only differ in the last letter follow each other, they are visited at once.
+
+        :param unit: The unit to search.
+        :return: Iterator over the length of the visited words and the range of their last letters. Meanwhile, the
+            current word starts with the other letters and the stack holds the states of these letters.
+        """
+
+        word, states, values = self.word, self.states, self.values
+        max_length, max_span = self.max_length, self.max_span
+        max_letter = len(values) - 1
+
+        if self.tables:
+            skip_rows, stretch_rows = self.tables.skips, self.tables.stretches
+        else:
+            skip_rows = stretch_rows = [[0] * len(values)] * (2 * max(max_span, values[-1]) + 1)
+
+        def push(letter: int):
+            value_sum, low, high, skips, stretches = states[-1]
+            next_sum = value_sum + values[letter]
+
+            word.append(letter)
+            states.append((next_sum, next_sum if next_sum < low else low, next_sum if next_sum > high else high,
+                           skips + skip_rows[value_sum][letter], stretches | stretch_rows[value_sum][letter]))
+
+        def pop():
+            word.pop()
+            states.pop()
+
+        del word[:], states[1:]
+
+        for letter in unit[:1] if unit[0] == unit[1] else unit:
+            push(letter)
+
+        while True:
+            length = len(word)
+
+            # the first two letters are never changed here, they belong to the unit
+            if length == max_length and length > 2:
+                yield length, range(word[-1], max_letter + 1)
+                pop()
+            else:
+                yield length, range(word[-1], word[-1] + 1)
+
+                # extend the word periodically (Duval's algorithm), unless no extension can fit into the shapes or
+                # reach a positive sum
+                while (len(word) < max_length and states[-1][2] - states[-1][1] <= max_span and
+                       states[-1][0] + (max_length - len(word)) * values[-1] > 0):
+                    push(word[-length])
+
+            while word and word[-1] == max_letter:
+                pop()
+
+            # the next word would change the first two letters, which belong to another unit
+            if len(word) <= 2:
+                return
+
+            letter = word[-1] + 1
+            pop()
+            push(letter)
+
+
+class ShapeMetrics(NamedTuple):
+    """
+    Represents the fret distances and string skips of every pair of notes in a set of shapes.
+
+    A pattern traverses all shapes of the same length the same way, so these shapes are combined to one table per
+    length: it holds the largest fret distance and the number of shapes which skip a string. The tables of all lengths
+    are concatenated, the entry for the notes a and b is at index offsets[i] + a * lengths[i] + b.
+    """
+
+    lengths: List[int]
+    offsets: List[int]
+    stretches: List[int]
+    string_skips: List[int]
+
+
+def get_shape_metrics(shapes: List[Shape]) -> ShapeMetrics:
+    """
+    Precomputes the metrics of a set of shapes used to rate patterns.
+
+    :param shapes: The shapes to compute the metrics for.
+    :return: The metrics of the shapes.
+    """
+
+    shapes_by_length: Dict[int, List[Shape]] = {}
+
+    for shape in shapes:
+        shapes_by_length.setdefault(len(shape), []).append(shape)
+
+    metrics = ShapeMetrics([], [], [], [])
+
+    for length, group in sorted(shapes_by_length.items()):
+        metrics.lengths.append(length)
+        metrics.offsets.append(len(metrics.stretches))
+
+        for a in range(length):
+            for b in range(length):
+                metrics.stretches.append(max(abs(shape[a].fret - shape[b].fret) for shape in group))
+                metrics.string_skips.append(sum(abs(shape[a].string - shape[b].string) > 1 for shape in group))
+
+    return metrics
+
+
+def rate_pattern(pattern: Pattern, shapes: ShapeMetrics, min_cycles=2) -> Optional[PatternRating]:
+    """
+    Rates a pattern across a set of shapes.
+
+    :param pattern: The pattern to rate.
+    :param shapes: Metrics of the shapes to generate the exercises with.
+    :param min_cycles: Minimum number of times the pattern has to be played in each shape.
+    :return: The rating or None if the pattern does not fit into one of the shapes.
+    """
+
+    cycle_length = len(pattern)
+    cycle_advance = sum(pattern)
+    prefix_sums = list(itertools.accumulate(pattern[:-1], initial=0))
+    start = -min(prefix_sums)
+    cycle_span = start + max(prefix_sums)
+
+    # like generate_exercise, only complete cycles are played: a cycle is played if its highest index is in the shape
+    cycle_counts = [max(0, -(-(length - cycle_span) // cycle_advance)) for length in shapes.lengths]
+
+    if min(cycle_counts) < min_cycles:
+        return None
+
+    walk = list(itertools.accumulate(itertools.islice(itertools.cycle(pattern), max(cycle_counts) * cycle_length - 1),
+                                     initial=start))
+
+    # the pair (0, 0) never adds stretch or string skips, it makes sure the item getter always returns a tuple
+    transitions = [0, 0]
+
+    for length, offset, cycle_count in zip(shapes.lengths, shapes.offsets, cycle_counts):
+        indices = walk[:cycle_count * cycle_length]
+        transitions.extend(map(operator.add, map(length.__mul__, indices), map(offset.__add__, indices[1:])))
+
+    get_transitions = operator.itemgetter(*transitions)
+    stretch = max(get_transitions(shapes.stretches))
+    string_skips = sum(get_transitions(shapes.string_skips))
+
+    return PatternRating(pattern, stretch, string_skips, min(cycle_counts) * cycle_length)
+
+
+class _TransitionTables(NamedTuple):
+    """
+    Represents the metrics of every transition a pattern can make in a set of shapes, packed into integers.
+
+    Every shape length and index (the first note of a cycle) is a field of the packed integers. skips[s][x] holds per
+    field the number of shapes which skip a string when moving from the note s after the field's index by the offset
+    x, in field_width bits. stretches[s][x] holds a bit per field and fret distance of the move: the bit
+    fret_distance * field_count + field. Packed metrics of several transitions are combined by adding the skips and by
+    or-ing the stretches, so a prefix combines the metrics of all transitions it makes at every possible index at once.
+    """
+
+    lengths: List[int]
+    field_starts: List[int]
+    field_count: int
+    field_width: int
+    max_stretch: int
+    skips: List[List[int]]
+    stretches: List[List[int]]
+
+
+def _get_transition_tables(shapes: ShapeMetrics, shape_counts: List[int], search: _PatternSearch) -> _TransitionTables:
+    field_starts = list(itertools.accumulate(shapes.lengths[:-1], initial=0))
+    field_count = sum(shapes.lengths)
+
+    # large enough for the skips of all transitions of an exercise, see _get_cycle_masks
+    max_skips = search.max_length * sum(length * count for length, count in zip(shapes.lengths, shape_counts))
+    field_width = (max_skips + 1).bit_length()
+
+    # the index s of a transition relative to the first note of the cycle lies within the span of an extended prefix
+    radius = max(search.max_span, max(search.values))
+    skips = [[0] * len(search.values) for _ in range(2 * radius + 1)]
+    stretches = [[0] * len(search.values) for _ in range(2 * radius + 1)]
+
+    for s in range(-radius, radius + 1):
+        for letter, value in enumerate(search.values):
+            for length, offset, field_start in zip(shapes.lengths, shapes.offsets, field_starts):
+                for index in range(length):
+                    a = index + s
+                    b = a + value
+
+                    if 0 <= a < length and 0 <= b < length:
+                        field = field_start + index
+                        table_index = offset + a * length + b
+
+                        # rows are stored so that negative indices of s work like Python list indices
+                        skips[s][letter] += shapes.string_skips[table_index] << (field * field_width)
+                        stretches[s][letter] |= 1 << (shapes.stretches[table_index] * field_count + field)
+
+    return _TransitionTables(shapes.lengths, field_starts, field_count, field_width, max(shapes.stretches), skips,
+                             stretches)
+
+
+class _CycleMasks(NamedTuple):
+    """
+    Selects the fields of the packed metrics which are played by a pattern (see _TransitionTables).
+
+    Every cycle except the last one makes all transitions of the pattern, the last one does not move on to the next
+    cycle.
+    """
+
+    skips: int
+    last_skips: int
+    stretches: int
+    last_stretches: int
+    cycle_count: int
+
+
+def _get_cycle_masks(tables: _TransitionTables, start: int, span: int, advance: int,
+                     min_cycles: int) -> Optional[_CycleMasks]:
+    # like generate_exercise, only complete cycles are played: a cycle is played if its highest index is in the shape
+    cycle_counts = [max(0, -(-(length - span) // advance)) for length in tables.lengths]
+
+    if min(cycle_counts) < min_cycles:
+        return None
+
+    skip_mask = (1 << tables.field_width) - 1
+    stretch_mask = sum(1 << (distance * tables.field_count) for distance in range(tables.max_stretch + 1))
+    masks = [0, 0, 0, 0]
+
+    for field_start, cycle_count in zip(tables.field_starts, cycle_counts):
+        for cycle in range(cycle_count):
+            field = field_start + start + cycle * advance
+            last = cycle == cycle_count - 1
+
+            masks[last] |= skip_mask << (field * tables.field_width)
+            masks[2 + last] |= stretch_mask << field
+
+    return _CycleMasks(*masks, min(cycle_counts))
+
+
+def rate_patterns(shapes: List[Shape], max_length: int, max_step: int, min_cycles=2, top: Optional[int] = None,
+                  units: Optional[Iterable[Tuple[int, int]]] = None) -> Iterator[PatternRating]:
+    """
+    Enumerates and rates all patterns which fit into a set of shapes, in the order of enumerate_patterns.
+
+    The ratings are the same as the ones of rate_pattern. Prefixes which span too many notes to play min_cycles cycles
+    in the shortest shape are not extended. The metrics of the transitions are kept per prefix (see _PatternSearch) and
+    per combination of start, span and sum of a pattern the notes played in each shape are selected by masks, so rating
+    a pattern needs no walk through the shapes.
+
+    :param shapes: The shapes to generate the exercises with.
+    :param max_length: Maximum number of offsets in a pattern.
+    :param max_step: Maximum absolute value of a single offset.
+    :param min_cycles: Minimum number of times the pattern has to be played in each shape.
+    :param top: If given, patterns which rank behind the best top patterns rated so far are skipped.
+    :param units: Units of the search to rate (defaults to all, see _PatternSearch.units).
+    :return: Iterator over the ratings of the patterns which fit into the shapes.
+    """
+
+    metrics = get_shape_metrics(shapes)
+    shape_counts = [sum(len(shape) == length for shape in shapes) for length in metrics.lengths]
+
+    # the note span of the cycle and min_cycles - 1 times the positive sum have to fit into the shortest shape
+    search = _PatternSearch(max_length, max_step, min(metrics.lengths) - min_cycles)
+    tables = _get_transition_tables(metrics, shape_counts, search)
+    search.tables = tables
+
+    # masks per start and span of a cycle, indexed by the sum of the pattern
+    masks_by_span: Dict[Tuple[int, int], List[Optional[_CycleMasks]]] = {}
+    min_length = min(tables.lengths)
+    modulus = (1 << tables.field_width) - 1
+    values, word, states = search.values, search.word, search.states
+
+    # negated ranking keys of the best ratings so far, the worst one first
+    best: List[Tuple[int, int, int]] = []
+
+    for unit in units if units is not None else search.units():
+        for length, letters in search.walk(unit):
+            value_sum, low, high, skips, stretches = states[length - 1]
+            start = -low
+            span = high - low
+
+            # only last letters with a positive sum which lets min_cycles cycles fit into the shortest shape
+            first = max(letters.start, bisect.bisect_left(values, 1 - value_sum))
+            stop = letters.stop
+
+            if min_cycles > 1:
+                max_advance = (min_length - span - 1) // (min_cycles - 1)
+                stop = min(stop, bisect.bisect_right(values, max_advance - value_sum))
+
+            if first >= stop:
+                continue
+
+            if (start, span) not in masks_by_span:
+                # the sum of the prefix and the last offset are both within the radius of the tables
+                masks_by_span[start, span] = [_get_cycle_masks(tables, start, span, advance, min_cycles)
+                                              for advance in range(1, len(tables.skips) + 1)]
+
+            masks_by_advance = masks_by_span[start, span]
+            prefix = None
+            skip_row, stretch_row = tables.skips[value_sum], tables.stretches[value_sum]
+
+            for letter in range(first, stop):
+                masks = masks_by_advance[value_sum + values[letter] - 1]
+
+                if not masks:
+                    continue
+
+                all_skips = skips + skip_row[letter]
+                all_stretches = stretches | stretch_row[letter]
+
+                # the sum of all selected fields (the modulus is one less than the field size and larger than the sum)
+                string_skips = ((all_skips & masks.skips) + (skips & masks.last_skips)) % modulus
+
+                if top is not None and len(best) == top and -string_skips < best[0][0]:
+                    continue
+
+                stretch_bit = max((all_stretches & masks.stretches).bit_length(),
+                                  (stretches & masks.last_stretches).bit_length()) - 1
+
+                stretch = max(0, stretch_bit // tables.field_count)
+                note_count = masks.cycle_count * length
+
+                if top is not None:
+                    key = (-string_skips, -stretch, note_count)
+
+                    # on a tie, the rating found first ranks first
+                    if len(best) < top:
+                        heapq.heappush(best, key)
+                    elif key > best[0]:
+                        heapq.heapreplace(best, key)
+                    else:
+                        continue
+
+                if prefix is None:
+                    prefix = tuple(values[x] for x in word[:length - 1])
+
+                yield PatternRating(prefix + (values[letter],), stretch, string_skips, note_count)
+
+
+_worker_search: Optional[Tuple[List[Shape], int, int, Optional[int]]] = None
+
+
+def _init_worker(shapes: List[Shape], max_length: int, max_step: int, top: Optional[int]):
+    global _worker_search
+    _worker_search = (shapes, max_length, max_step, top)
+
+
+def _rate_unit_in_worker(unit: Tuple[int, int]) -> List[PatternRating]:
+    shapes, max_length, max_step, top = _worker_search
+    return _rank_ratings(rate_patterns(shapes, max_length, max_step, top=top, units=[unit]), top)
+
+
+def discover_patterns(ctx: Context, max_length: int, max_step: int, processes: Optional[int] = None,
+                      top: Optional[int] = None) -> List[PatternRating]:
+    """
+    Enumerates all patterns up to a given length and ranks them across all CAGED shapes of a fretboard context.
+
+    :param ctx: The fretboard context.
+    :param max_length: Maximum number of offsets in a pattern.
+    :param max_step: Maximum absolute value of a single offset.
+    :param processes: Number of worker processes (defaults to the number of CPUs, 1 rates in this process).
+    :param top: Number of best patterns to return (defaults to all usable patterns).
+    :return: Ratings of the best patterns, best first.
+    """
+
+    shapes = list(get_all_caged_shapes(ctx).values())
+
+    if processes == 1:
+        return _rank_ratings(rate_patterns(shapes, max_length, max_step, top=top), top)
+
+    # each worker ranks whole units, units are returned in order so ties keep the order of enumeration
+    units = _PatternSearch(max_length, max_step).units()
+
+    with ProcessPoolExecutor(processes, initializer=_init_worker,
+                             initargs=(shapes, max_length, max_step, top)) as executor:
+        return _rank_ratings(itertools.chain.from_iterable(executor.map(_rate_unit_in_worker, units)), top)
+
+
+def _rank_ratings(ratings: Iterable[PatternRating], top: Optional[int]) -> List[PatternRating]:
+    if top is None:
+        return sorted(ratings, key=PatternRating.ranking_key)
+
+    # only the best ratings are kept in memory
+    return heapq.nsmallest(top, ratings, key=PatternRating.ranking_key)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG_PATH, help='Path to the exercise catalog.')
+    parser.add_argument('--max-length', type=int, default=4, help='Maximum number of offsets in a pattern.')
+    parser.add_argument('--max-step', type=int, default=4, help='Maximum absolute value of a single offset.')
+    parser.add_argument('--scale', help='Scale used to rate the patterns (defaults to the first one of the catalog).')
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Number of worker processes.')
+    parser.add_argument('--top', type=int, default=20, help='Number of patterns to print.')
+    args = parser.parse_args()
+
+    catalog = load_catalog(args.catalog)
+    ctx = Context(Tuning.from_text(catalog.tuning_text), Scale.from_text(args.scale or catalog.scale_texts[0]))
+    ratings = discover_patterns(ctx, args.max_length, args.max_step, args.processes, args.top)
+    known_patterns = {canonicalize(exercise.pattern) for exercise in catalog.exercises}
+
+    for rating in ratings:
+        known = ' (known)' if rating.pattern in known_patterns else ''
+        print(f'{list(rating.pattern)}: {rating.note_count} notes, stretch {rating.stretch}, '
+              f'{rating.string_skips} string skips{known}')
+
+
+if __name__ == '__main__':
+    main()
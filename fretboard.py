@@ -121,6 +121,12 @@ class Context:
         self.tuning = tuning
         self.scale = scale
 
+    def __hash__(self):
+        return hash((self.tuning, self.scale))
+
+    def __eq__(self, other: Context):
+        return self.tuning == other.tuning and self.scale == other.scale
+
 
 class Tuning:
     """
@@ -184,6 +190,12 @@ class Tuning:
 
         raise NotImplementedError()
 
+    def __hash__(self):
+        return hash(tuple(self.strings))
+
+    def __eq__(self, other: Tuning):
+        return self.strings == other.strings
+
 
 class Position(NamedTuple):
     """
@@ -3,131 +3,84 @@ from __future__ import annotations
 import argparse
 import random
 
-from typing import List
-from exercises import Feel, ExerciseDescriptor, generate_exercise
-from fretboard import Tuning, Context, get_all_caged_shapes
+from annotation import PickingStyle, annotate_exercise
+from catalog import DEFAULT_CATALOG_PATH, load_catalog
+from connections import get_connected_shape
+from corpus import Corpus
+from exercises import generate_exercise
+from fretboard import Tuning, Context, CagedPosition, get_all_caged_shapes
 from music_theory import Scale
 from output import GuitarProFile, print_shape, print_tab, print_header
 
-ED = ExerciseDescriptor
-
-# Tuning used for the generated exercises
-tuning_text = 'E2-A2-D3-G3-B3-E4'
-
-# Scales used for the generated exercises
-scale_texts = [
-    'E Aeolian',
-    'A Aeolian',
-    'G Aeolian',
-    'D Aeolian',
-]
-
-# Exercises with melodic sequences
-melodic_sequences = [
-    ED('Melodic Sequences: 1a*', [1, 1, 1, -2], Feel.STRAIGHT),
-    ED('Melodic Sequences: 1b*', [1, 1, -2, 1], Feel.STRAIGHT),
-    # ED('Melodic Sequences: 1c', [1, -2, 1, 1], Feel.STRAIGHT),
-    ED('Melodic Sequences: 1d*', [-2, 1, 1, 1], Feel.STRAIGHT),
-    # ED('Melodic Sequences: 1e', [-1, -1, 2, 1], Feel.STRAIGHT),
-    ED('Melodic Sequences: 1f*', [1, 1, -1], Feel.STRAIGHT),
-    ED('Melodic Sequences: 1g*', [1, 1, -1], Feel.TRIPLET),
-    ED('Melodic Sequences: 1h*', [-1, -1, 3], Feel.TRIPLET),
-    ED('Melodic Sequences: 1i*', [-1, 1, 1], Feel.TRIPLET),
-    # ED('Melodic Sequences: 1j', [1, -1, 1], Feel.TRIPLET),
-    # ED('Melodic Sequences: 1k', [1, 1, 1, -2], Feel.TRIPLET),
-]
-
-# Exercises with intervals
-intervals = {
-    '3rds*': 2,
-    # '4ths*': 3,
-    # '5ths': 4,
-    # '6ths*': 5,
-    # '7ths': 6,
-    # 'Octaves': 7,
-}
-
-interval_patterns = [
-    *[ED(f'{n}: Normal*', [s, -(s - 1)], Feel.STRAIGHT) for n, s in intervals.items()],
-    *[ED(f'{n}: Inverted*', [-s, (s + 1)], Feel.STRAIGHT) for n, s in intervals.items()],
-    *[ED(f'{n}: One Up, One Down*', [s, 1, -s, 1], Feel.STRAIGHT) for n, s in intervals.items()],
-    # *[ED(f'{n}: One Down, One Up', [-s, 1, s, 1], Feel.STRAIGHT) for n, s in intervals.items()],
-    *[ED(f'{n}: Two Up, One Down*', [s, -(s - 1), s, 1, -s, 1], Feel.STRAIGHT) for n, s in intervals.items()],
-    # *[ED(f'{n}: Two Down, One Up', [-s, (s + 1), -s, 1, s, 1], Feel.STRAIGHT) for n, s in intervals.items()],
-    # *[ED(f'{n}: In Triplets*', [s, -(s - 1)], Feel.TRIPLET) for n, s in intervals.items()],
-    # *[ED(f'{n}: One Up, One Down, In Triplets*', [s, 1, -s], Feel.TRIPLET) for n, s in intervals.items()],
-]
-
-# Exercises with triads
-triad_patterns = [
-    ED('Triads: Ascending*', [2, 2, -3], Feel.TRIPLET),
-    ED('Triads: Descending*', [-2, -2, 5], Feel.TRIPLET),
-    ED('Triads: Combined*', [2, 2, 1, -2, -2, 1], Feel.TRIPLET),
-    ED('Triads: High, Low, Middle*', [-4, 2, 3], Feel.TRIPLET),
-    # ED('Triads: Middle, High, Low', [2, -4, 3], Feel.TRIPLET),
-    ED('Triads: Four Note Pattern, Low Note Doubled*', [2, 2, -4, 1], Feel.STRAIGHT),
-    # ED('Triads: Four Note Pattern, Middle Note Doubled', [2, 2, -2, -1], Feel.STRAIGHT),
-    # ED('Triads: Four Note Pattern, Low Note Doubled 2', [4, -2, -2, 1], Feel.STRAIGHT),
-    # ED('Triads: Four Note Pattern, Middle Note Doubled 2', [-2, 2, 2, -1], Feel.STRAIGHT),
-    ED('Triads: Four Note Pattern, High Note Doubled*', [-4, 2, 2, 1], Feel.STRAIGHT),
-    # ED('Triads: Ascending, 3 Against 2 Feel*', [2, 2, -3], Feel.STRAIGHT),
-    # ED('Triads: Descending, 3 Against 2 Feel', [-2, -2, 5], Feel.STRAIGHT),
-    # ED('Triads: Combined, 3 Against 2 Feel', [2, 2, 1, -2, -2, 1], Feel.STRAIGHT),
-    # ED('Triads: Reversed Combined, 3 Against 2 Feel', [-2, -2, 1, 2, 2, 1], Feel.STRAIGHT),
-]
-
-# Exercises with arpeggios
-arpeggio_patterns = [
-    ED('Arpeggios: Ascending*', [2, 2, 2, -5], Feel.STRAIGHT),
-    ED('Arpeggios: Descending*', [-2, -2, -2, 7], Feel.STRAIGHT),
-    # ED('Arpeggios: Ascend Then Descend', [2, 2, 2, 1, -2, -2, -2, 1], Feel.STRAIGHT),
-    # ED('Arpeggios: Descend Then Ascend', [-2, -2, -2, 1, 2, 2, 2, 1], Feel.STRAIGHT),
-    # ED('Arpeggios: Low To High Then Descend', [6, -2, -2, -1], Feel.STRAIGHT),
-    # ED('Arpeggios: Descend Then Jump', [-2, -2, 6, -1], Feel.STRAIGHT),
-    # ED('Arpeggios: 4 Against 3 Feel Ascending*', [2, 2, 2, -5], Feel.TRIPLET),
-    # ED('Arpeggios: 4 Against 3 Feel Descending*', [-2, -2, -2, 7], Feel.TRIPLET),
-    # ED('Arpeggios: 4 Against 3 Feel Ascend Then Descend*', [2, 2, 2, 1, -2, -2, -2, 1], Feel.TRIPLET),
-    # ED('Arpeggios: 4 Against 3 Feel Descend Then Ascend', [-2, -2, -2, 1, 2, 2, 2, 1], Feel.TRIPLET),
-]
-
-# Collect all exercises in a single list
-all_exercises: List[ExerciseDescriptor] = [
-    *melodic_sequences,
-    *interval_patterns,
-    *triad_patterns,
-    *arpeggio_patterns,
-]
-
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('output_file', help='Path to the generated GuitarPro file.')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG_PATH, help='Path to the exercise catalog.')
+    parser.add_argument('--corpus', help='Path to a precomputed corpus file (see corpus.py).')
+    parser.add_argument('--connected', action='store_true', help='Connect all CAGED shapes to a single exercise.')
+    parser.add_argument('--wav', help='Path to render the exercise to as WAV file.')
+    parser.add_argument('--click', action='store_true', help='Add a click track to the rendered WAV file.')
+    parser.add_argument('--picking', choices=[str(x) for x in PickingStyle], default=str(PickingStyle.ALTERNATE),
+                        help='Picking technique used to annotate the exercise.')
     args = parser.parse_args()
 
-    # determine shape for the exercise
-    scale_text = random.choice(scale_texts)
-    ctx = Context(Tuning.from_text(tuning_text), Scale.from_text(scale_text))
-    caged_position, shape = random.choice(list(get_all_caged_shapes(ctx).items()))
-
-    # generate exercise
-    exercise = random.choice(all_exercises)
-    positions = generate_exercise(shape, exercise.pattern)
-    positions_reverse = generate_exercise(shape, exercise.pattern, reverse=True)
+    catalog = load_catalog(args.catalog)
+    scale_text = random.choice(catalog.scale_texts)
+    ctx = Context(Tuning.from_text(catalog.tuning_text), Scale.from_text(scale_text))
+    exercise = random.choice(catalog.exercises)
+
+    if args.connected:
+        # connect all shapes and generate exercise
+        shape_name = 'Connected Shapes'
+        shape = get_connected_shape(ctx)
+        positions = generate_exercise(shape, exercise.pattern)
+        positions_reverse = generate_exercise(shape, exercise.pattern, reverse=True)
+    elif args.corpus:
+        # look up shape and exercise in the corpus
+        with Corpus(args.corpus, catalog.tuning_text) as corpus:
+            caged_position = random.choice(list(CagedPosition))
+            shape_name = f'{caged_position.name} Shape'
+            shape = corpus.get_shape(scale_text, caged_position)
+            positions = corpus.get_exercise(scale_text, caged_position, exercise.pattern)
+            positions_reverse = corpus.get_exercise(scale_text, caged_position, exercise.pattern, reverse=True)
+    else:
+        # determine shape for the exercise
+        caged_position, shape = random.choice(list(get_all_caged_shapes(ctx).items()))
+        shape_name = f'{caged_position.name} Shape'
+
+        # generate exercise
+        positions = generate_exercise(shape, exercise.pattern)
+        positions_reverse = generate_exercise(shape, exercise.pattern, reverse=True)
+
+    # annotate fingers and pick directions
+    picking = PickingStyle[args.picking.upper()]
+    annotations = annotate_exercise(positions, picking)
+    annotations_reverse = annotate_exercise(positions_reverse, picking)
 
     # print to console
-    print_header(f'{scale_text} - {caged_position.name} Shape')
+    print_header(f'{scale_text} - {shape_name}')
     print_shape(ctx, shape)
 
     print_header(exercise.name)
-    print_tab(ctx, positions)
+    print_tab(ctx, positions, annotations)
     print()
 
     # write to file
-    output_file = GuitarProFile('Exercises', f'{scale_text} - {caged_position.name} Shape')
-    output_file.add_exercise(exercise.name, positions, exercise.feel)
-    output_file.add_exercise('', positions_reverse, exercise.feel)
+    output_file = GuitarProFile('Exercises', f'{scale_text} - {shape_name}')
+    output_file.add_exercise(exercise.name, positions, exercise.feel, annotations)
+    output_file.add_exercise('', positions_reverse, exercise.feel, annotations_reverse)
     output_file.write(args.output_file)
 
+    if args.wav:
+        # NumPy is only required for audio output
+        from audio import WavFile
+
+        wav_file = WavFile(ctx.tuning, output_file.song.tempo, args.click)
+        wav_file.add_exercise(positions, exercise.feel)
+        wav_file.add_exercise(positions_reverse, exercise.feel)
+        wav_file.write(args.wav)
+
 
 if __name__ == '__main__':
     main()
@@ -76,6 +76,12 @@ class Scale:
 
         return RelNote((self.root.value + scale_degree.value) % 12)
 
+    def __hash__(self):
+        return hash((self.root, tuple(self.degrees)))
+
+    def __eq__(self, other: Scale):
+        return self.root == other.root and self.degrees == other.degrees
+
 
 class ScaleType:
     """
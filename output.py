@@ -1,13 +1,20 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 
 import guitarpro
 
+from annotation import Annotation, PickDirection, OPEN_STRING
 from exercises import Feel
 from fretboard import Position, Context
 
 
+pick_strokes = {
+    PickDirection.DOWN: guitarpro.BeatStrokeDirection.down,
+    PickDirection.UP: guitarpro.BeatStrokeDirection.up,
+}
+
+
 class GuitarProFile:
     def __init__(self, title: str, subtitle: str):
         self.song = guitarpro.Song()
@@ -15,7 +22,8 @@ class GuitarProFile:
         self.song.subtitle = subtitle
         self.song.tempo = 100
 
-    def add_exercise(self, name: str, positions: List[Position], rhythm: Feel):
+    def add_exercise(self, name: str, positions: List[Position], rhythm: Feel,
+                     annotations: Optional[List[Annotation]] = None):
         rhythm_settings = {
             Feel.STRAIGHT: (16, guitarpro.Duration(guitarpro.Duration.sixteenth)),
             Feel.TRIPLET: (12, guitarpro.Duration(guitarpro.Duration.eighth, False, guitarpro.Tuplet(3, 2))),
@@ -51,6 +59,12 @@ class GuitarProFile:
             note.string = position.string + 1
             beat.notes.append(note)
 
+            if annotations:
+                annotation = annotations[i]
+                beat.effect.pickStroke = pick_strokes[annotation.pick]
+                if annotation.finger != OPEN_STRING:
+                    note.effect.leftHandFinger = guitarpro.Fingering(annotation.finger)
+
     def write(self, path: str):
         guitarpro.write(self.song, path)
 
@@ -74,7 +88,7 @@ def print_shape(ctx: Context, shape: List[Position]):
         print(line)
 
 
-def print_tab(ctx: Context, positions: List[Position]):
+def print_tab(ctx: Context, positions: List[Position], annotations: Optional[List[Annotation]] = None):
     lines = ['-' for _ in range(ctx.tuning.string_count())]
 
     for position in positions:
@@ -84,6 +98,17 @@ def print_tab(ctx: Context, positions: List[Position]):
             else:
                 lines[string] += '-' * (len(str(position.fret)) + 1)
 
+    if annotations:
+        finger_line = ' '
+        pick_line = ' '
+
+        for position, annotation in zip(positions, annotations):
+            width = len(str(position.fret)) + 1
+            finger_line += ('' if annotation.finger == OPEN_STRING else str(annotation.finger)).ljust(width)
+            pick_line += str(annotation.pick).ljust(width)
+
+        lines.extend([finger_line, pick_line])
+
     for line in lines:
         print(line)
 